@@ -1,17 +1,25 @@
 import requests
 import os
+import sys
+import ctypes
 import shutil
 import logging
-import time
-import zipfile
-import io
 import stat
-import subprocess
-from datetime import datetime
+import json
+import atexit
+import tempfile
+import threading
+import time
+import signal
+import functools
+import hashlib
+import heapq
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import unquote, urlsplit
 from tqdm import tqdm
 from requests.adapters import HTTPAdapter
 from requests.packages.urllib3.util.retry import Retry
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 from config import *
 
 class GitHubBackupError(Exception):
@@ -34,21 +42,147 @@ class SecurityError(GitHubBackupError):
     """安全相关错误"""
     pass
 
-# 配置日志
-logging.basicConfig(
-    level=getattr(logging, LOG_LEVEL),
-    format=LOG_FORMAT,
-    handlers=[
-        logging.FileHandler(LOG_FILE),
-        logging.StreamHandler()
-    ]
-)
+# 下载文件时覆盖会话中API用的Accept头
+_DOWNLOAD_HEADERS = {'Accept': 'application/octet-stream'}
+
+# 这些主机不需要令牌，请求时去掉会话中的 Authorization 头，避免泄露令牌
+_ANONYMOUS_HOSTS = ('codeload.github.com',)
+
+
+def _headers_for(url, headers=None, origin=None):
+    """返回请求指定URL时需要覆盖的请求头，值为 None 的头会从会话默认值中去掉"""
+    # origin 为重定向前的地址：直接请求其他主机（如带签名的CDN地址）时同样去掉令牌，
+    # 与 requests 自动跟随跨主机重定向时的行为一致
+    host = urlsplit(url).hostname
+    if host in _ANONYMOUS_HOSTS or (origin and host != urlsplit(origin).hostname):
+        return {**(headers or {}), 'Authorization': None}
+    return headers
+
+# 条件请求命中(304)时的下载结果：本地已有的文件仍然有效
+NOT_MODIFIED = object()
+
+
+class _RangeNotSatisfied(DownloadError):
+    """分段请求未得到206响应（服务器忽略Range或 If-Range 不匹配）"""
+    pass
+
+def _read_json(path, what):
+    """读取JSON文件，文件不存在或读取失败时返回空字典"""
+    try:
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+    except Exception as e:
+        logger.error(f"读取{what}失败 {path}: {str(e)}")
+    return {}
+
+def _write_json_atomic(path, data, what):
+    """先写临时文件再替换，中断时不会留下不完整的文件；返回是否保存成功"""
+    tmp_path = path + '.tmp'
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        return True
+    except Exception as e:
+        logger.error(f"保存{what}失败 {path}: {str(e)}")
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        return False
+
+@functools.lru_cache(maxsize=None)
+def _native_fallocate():
+    """返回 libc 中的 fallocate 函数，非Linux系统返回 None"""
+    if not sys.platform.startswith('linux'):
+        return None
+    try:
+        libc = ctypes.CDLL(None, use_errno=True)
+        fallocate = getattr(libc, 'fallocate64', None) or libc.fallocate
+    except (OSError, AttributeError):
+        return None
+    fallocate.argtypes = [ctypes.c_int, ctypes.c_int, ctypes.c_int64, ctypes.c_int64]
+    fallocate.restype = ctypes.c_int
+    return fallocate
+
+class _ProgressWriter:
+    """包装文件对象，写入的同时更新进度条和摘要"""
+    def __init__(self, f, pbar, digest=None):
+        self._f = f
+        self._pbar = pbar
+        self._digest = digest
+
+    def write(self, data):
+        size = self._f.write(data)
+        if self._digest is not None:
+            self._digest.update(data)
+        self._pbar.update(size)
+        return size
+
+class _LazyTime:
+    """日志参数：只有日志实际输出时才把时间戳格式化为可读时间"""
+    def __init__(self, timestamp):
+        self._timestamp = timestamp
+
+    def __str__(self):
+        # 只在输出调试日志时用到，按需导入
+        from datetime import datetime
+        return str(datetime.fromtimestamp(self._timestamp))
+
 logger = logging.getLogger(__name__)
 
+def setup_logging():
+    """配置日志（仅在作为脚本运行时调用，导入本模块不会创建日志文件或修改全局日志配置）"""
+    logging.basicConfig(
+        level=getattr(logging, LOG_LEVEL),
+        format=LOG_FORMAT,
+        handlers=[
+            logging.FileHandler(LOG_FILE),
+            logging.StreamHandler()
+        ]
+    )
+
 class GitHubBackup:
     def __init__(self):
         self.session = self._create_session()
         self._ensure_download_dir()
+        # 下载根目录的绝对路径只计算一次，供删除目录时的安全检查使用
+        self._downloads_root = os.path.abspath(DOWNLOAD_DIR)
+        
+        # 所有仓库共用一个下载线程池，限制全局并发传输数量
+        self._download_executor = ThreadPoolExecutor(max_workers=MAX_PARALLEL_DOWNLOADS)
+        # 在查询release信息的同时提前建立到下载主机的连接，下载开始时连接池已就绪
+        self._download_executor.submit(self._warm_up, "https://codeload.github.com")
+        
+        # API响应的ETag缓存，条件请求命中(304)时不消耗速率限制
+        self._etag_cache_path = os.path.join(DOWNLOAD_DIR, '.etag_cache.json')
+        self._etag_cache = self._load_etag_cache()
+        self._etag_cache_dirty = False
+        self._etag_lock = threading.Lock()
+        atexit.register(self.save_etag_cache)
+
+    def _warm_up(self, url):
+        """向指定主机发送HEAD请求，预先完成TCP/TLS握手并放入连接池"""
+        try:
+            self.session.head(url, headers=_headers_for(url), timeout=TIMEOUT)
+        except requests.exceptions.RequestException as e:
+            logger.debug(f"预热连接失败 {url}: {str(e)}")
+
+    def close(self) -> None:
+        """关闭下载线程池和请求会话"""
+        self._download_executor.shutdown(wait=True)
+        self.session.close()
+
+    def cancel_pending_downloads(self) -> None:
+        """取消尚未开始的下载任务，正在进行的传输会继续完成"""
+        try:
+            self._download_executor.shutdown(wait=False, cancel_futures=True)
+        except TypeError:
+            # Python 3.8 及以下不支持 cancel_futures
+            self._download_executor.shutdown(wait=False)
 
     def _create_session(self) -> requests.Session:
         """创建并配置请求会话"""
@@ -56,18 +190,31 @@ class GitHubBackup:
         retry_strategy = Retry(
             total=MAX_RETRIES,
             backoff_factor=BACKOFF_FACTOR,
-            status_forcelist=RETRY_STATUS_CODES
+            status_forcelist=RETRY_STATUS_CODES,
+            allowed_methods=frozenset(['GET', 'HEAD']),
+            respect_retry_after_header=True
+        )
+        adapter = HTTPAdapter(
+            pool_connections=POOL_CONNECTIONS,
+            pool_maxsize=POOL_MAXSIZE,
+            max_retries=retry_strategy,
+            pool_block=False
         )
-        adapter = HTTPAdapter(max_retries=retry_strategy)
         session.mount("https://", adapter)
         session.mount("http://", adapter)
         
         # 配置代理
-        if HTTP_PROXY or HTTPS_PROXY:
-            session.proxies = {
-                'http': HTTP_PROXY,
-                'https': HTTPS_PROXY
-            }
+        if HTTP_PROXY:
+            session.proxies['http'] = HTTP_PROXY
+        if HTTPS_PROXY:
+            session.proxies['https'] = HTTPS_PROXY
+        
+        # 固定的请求头只设置一次，所有请求共用
+        session.headers.update({
+            'Authorization': f'token {GITHUB_TOKEN}',
+            'User-Agent': USER_AGENT,
+            'Accept': GITHUB_API_VERSION
+        })
         return session
 
     def _ensure_download_dir(self) -> None:
@@ -77,45 +224,159 @@ class GitHubBackup:
         except Exception as e:
             raise FileSystemError(f"创建下载目录失败: {str(e)}")
 
-    def _get_headers(self) -> Dict[str, str]:
-        """获取HTTP请求头"""
-        return {
-            'Authorization': f'token {GITHUB_TOKEN}',
-            'User-Agent': USER_AGENT,
-            'Accept': GITHUB_API_VERSION
-        }
+    def _load_etag_cache(self) -> Dict[str, Dict[str, Any]]:
+        """读取本地保存的ETag缓存"""
+        return _read_json(self._etag_cache_path, 'ETag缓存')
+
+    def prune_etag_cache(self, repos: List[str]) -> None:
+        """移除不再监控的仓库的ETag缓存"""
+        keep = {f"https://api.github.com/repos/{repo}/releases/latest" for repo in repos}
+        with self._etag_lock:
+            stale = [url for url in self._etag_cache if url not in keep]
+            for url in stale:
+                del self._etag_cache[url]
+            if stale:
+                self._etag_cache_dirty = True
 
-    def get_latest_release(self, repo: str) -> Optional[Dict[str, Any]]:
+    def save_etag_cache(self) -> None:
+        """将ETag缓存原子地写回磁盘"""
+        with self._etag_lock:
+            if not self._etag_cache_dirty:
+                return
+            if _write_json_atomic(self._etag_cache_path, self._etag_cache, 'ETag缓存'):
+                self._etag_cache_dirty = False
+
+    def _latest_tag_from_web(self, repo: str) -> Optional[str]:
+        """通过 github.com/<repo>/releases/latest 的重定向地址获取最新release的tag，失败时返回 None"""
+        try:
+            response = self.session.head(f"https://github.com/{repo}/releases/latest",
+                                         allow_redirects=False, timeout=TIMEOUT)
+        except requests.exceptions.RequestException as e:
+            logger.debug(f"获取最新release重定向失败 {repo}: {str(e)}")
+            return None
+        location = response.headers.get('Location', '')
+        marker = '/releases/tag/'
+        if response.is_redirect and marker in location:
+            return unquote(location.split(marker, 1)[1])
+        return None
+
+    def get_latest_release(self, repo: str, local_version: Optional[str] = None) -> Optional[Dict[str, Any]]:
         """获取仓库最新的release版本和资源文件信息"""
         url = f"https://api.github.com/repos/{repo}/releases/latest"
+        cached = self._etag_cache.get(url)
+        headers = {'If-None-Match': cached['etag']} if cached else None
         
-        for attempt in range(MAX_DOWNLOAD_ATTEMPTS):
-            try:
-                response = self.session.get(url, headers=self._get_headers(), timeout=TIMEOUT)
-                response.raise_for_status()
-                data = response.json()
-                
-                tag_name = data.get('tag_name')
-                if tag_name:
-                    logger.info(f"仓库 {repo} 的最新release版本是 {tag_name}")
-                    return {
-                        'tag_name': tag_name,
-                        'assets': data.get('assets', [])
+        # 没有ETag缓存时，先通过网页的重定向确认是否有新版本，不消耗API速率限制；
+        # 与本地版本一致时只返回 unchanged 标记，不再解析资源文件列表
+        if local_version and not cached and self._latest_tag_from_web(repo) == local_version:
+            logger.info(f"仓库 {repo} 的最新release版本仍是 {local_version}")
+            return {'tag_name': local_version, 'unchanged': True}
+        
+        # 重试和退避交给会话的 urllib3 Retry 处理
+        try:
+            response = self.session.get(url, headers=headers, timeout=TIMEOUT)
+            response.raise_for_status()
+            if response.status_code == 304 and cached:
+                logger.info(f"仓库 {repo} 的release信息未变化，最新版本是 {cached['data']['tag_name']}")
+                if local_version and local_version == cached['data']['tag_name']:
+                    return {'tag_name': local_version, 'unchanged': True}
+                return cached['data']
+            data = response.json()
+        except requests.exceptions.RequestException as e:
+            raise NetworkError(f"获取仓库最新release版本失败 {repo}: {str(e)}")
+        
+        tag_name = data.get('tag_name')
+        if tag_name:
+            logger.info(f"仓库 {repo} 的最新release版本是 {tag_name}")
+            release = {
+                'tag_name': tag_name,
+                'assets': [
+                    {
+                        'name': asset['name'],
+                        'browser_download_url': asset['browser_download_url'],
+                        'size': asset.get('size'),
+                        'digest': asset.get('digest')
                     }
-                return None
-            except requests.exceptions.RequestException as e:
-                if attempt < MAX_DOWNLOAD_ATTEMPTS - 1:
-                    wait_time = RETRY_DELAY * (attempt + 1)
-                    logger.warning(f"获取release信息失败，{wait_time}秒后重试: {str(e)}")
-                    time.sleep(wait_time)
-                else:
-                    raise NetworkError(f"获取仓库最新release版本失败 {repo}: {str(e)}")
+                    for asset in data.get('assets', [])
+                ]
+            }
+            etag = response.headers.get('ETag')
+            if etag:
+                with self._etag_lock:
+                    self._etag_cache[url] = {'etag': etag, 'data': release}
+                    self._etag_cache_dirty = True
+            return release
+        return None
+
+    def get_latest_releases_bulk(self, repos: List[str]) -> Dict[str, Optional[Dict[str, Any]]]:
+        """通过一次GraphQL请求获取多个仓库的最新release版本和资源文件信息"""
+        declarations, fields, variables = [], [], {}
+        for i, repo in enumerate(repos):
+            owner, _, name = repo.partition('/')
+            if not owner or not name:
+                continue
+            declarations.append(f"$owner{i}: String!, $name{i}: String!")
+            fields.append(
+                f"r{i}: repository(owner: $owner{i}, name: $name{i}) {{ latestRelease {{ tagName "
+                f"releaseAssets(first: 100) {{ pageInfo {{ hasNextPage }} nodes {{ name downloadUrl size }} }} }} }}"
+            )
+            variables[f"owner{i}"] = owner
+            variables[f"name{i}"] = name
+        if not fields:
+            return {}
+        query = f"query({', '.join(declarations)}) {{ {' '.join(fields)} }}"
+
+        try:
+            response = self.session.post(
+                "https://api.github.com/graphql",
+                json={'query': query, 'variables': variables},
+                timeout=TIMEOUT
+            )
+            response.raise_for_status()
+            payload = response.json()
+        except (requests.exceptions.RequestException, ValueError) as e:
+            raise NetworkError(f"批量获取release信息失败: {str(e)}")
+
+        # 没有release的仓库值为 None；未能解析的仓库（不存在、无权限、资源文件过多需分页）
+        # 不放入结果，由调用方改用 get_latest_release 单独查询
+        data = payload.get('data') or {}
+        releases = {}
+        for i, repo in enumerate(repos):
+            node = data.get(f"r{i}")
+            if node is None:
+                continue
+            release = node.get('latestRelease')
+            if not release:
+                releases[repo] = None
+                continue
+            assets = release['releaseAssets']
+            if assets['pageInfo']['hasNextPage']:
+                continue
+            logger.info("仓库 %s 的最新release版本是 %s", repo, release['tagName'])
+            releases[repo] = {
+                'tag_name': release['tagName'],
+                'assets': [
+                    {
+                        'name': asset['name'],
+                        'browser_download_url': asset['downloadUrl'],
+                        'size': asset['size']
+                    }
+                    for asset in assets['nodes']
+                ]
+            }
+        return releases
 
     def remove_readonly(self, func, path, _):
         """清除文件的只读属性并重试删除"""
         try:
             os.chmod(path, stat.S_IWRITE)
-            func(path)
+            # rmdir 遇到的是文件（例如指向文件的链接）时改用 unlink
+            if func is os.rmdir and not os.path.isdir(path):
+                os.unlink(path)
+            else:
+                func(path)
+        except FileNotFoundError:
+            pass  # 已被其他进程删除
         except Exception as e:
             logger.error(f"删除文件失败 {path}: {str(e)}")
 
@@ -124,10 +385,14 @@ class GitHubBackup:
         try:
             # 规范化路径
             dir_path = os.path.abspath(dir_path)
-            downloads_path = os.path.abspath(DOWNLOAD_DIR)
+            downloads_path = self._downloads_root
             
-            # 安全检查：确保要删除的目录在 downloads 目录下
-            if not dir_path.startswith(downloads_path):
+            # 安全检查：确保要删除的目录在 downloads 目录下（按路径组成比较，downloads_backup 之类的同前缀目录不算）
+            try:
+                inside = os.path.commonpath([dir_path, downloads_path]) == downloads_path
+            except ValueError:  # Windows 下位于不同盘符
+                inside = False
+            if not inside:
                 raise SecurityError(f"安全限制：不能删除 {DOWNLOAD_DIR} 目录之外的文件")
                 
             if not os.path.exists(dir_path):
@@ -141,64 +406,265 @@ class GitHubBackup:
                 logger.error(f"没有权限访问目录: {dir_path}")
                 return
                 
-            # 尝试删除
-            try:
-                shutil.rmtree(dir_path)
-                logger.info(f"成功删除目录: {dir_path}")
-                return
-            except PermissionError:
-                # 处理只读文件
-                try:
-                    shutil.rmtree(dir_path, onerror=self.remove_readonly)
-                    logger.info(f"成功删除只读目录: {dir_path}")
-                    return
-                except Exception as e:
-                    logger.error(f"删除只读目录失败: {str(e)}")
-                    
-            # 如果上述方法都失败，尝试使用系统命令
-            try:
-                if os.name == 'nt':  # Windows
-                    result = subprocess.run(['cmd', '/c', 'rd', '/s', '/q', dir_path], 
-                                         capture_output=True, 
-                                         text=True, 
-                                         check=False)
-                    if result.returncode != 0:
-                        logger.error(f"系统命令删除失败: {result.stderr}")
-                else:  # Linux/Unix
-                    result = subprocess.run(['rm', '-rf', dir_path], 
-                                         capture_output=True, 
-                                         text=True, 
-                                         check=False)
-                    if result.returncode != 0:
-                        logger.error(f"系统命令删除失败: {result.stderr}")
-            except Exception as e:
-                logger.error(f"系统命令执行失败: {str(e)}")
-                raise
+            # 在进程内删除，只读文件由 remove_readonly 处理
+            shutil.rmtree(dir_path, onerror=self.remove_readonly)
+            if os.path.exists(dir_path):
+                raise FileSystemError(f"目录未能完全删除: {dir_path}")
+            logger.info(f"成功删除目录: {dir_path}")
                 
         except Exception as e:
             logger.error(f"删除目录时发生错误 {dir_path}: {str(e)}")
             raise
 
-    def download_file_with_progress(self, url, local_filename, headers):
-        """带进度条的文件下载"""
+    def _open_stream(self, url, headers=None):
+        """发起流式GET请求，返回尚未读取内容的响应"""
+        headers = {**_DOWNLOAD_HEADERS, **headers} if headers else _DOWNLOAD_HEADERS
+        response = self.session.get(url, headers=_headers_for(url, headers), stream=True, timeout=TIMEOUT)
+        response.raise_for_status()
+        response.raw.decode_content = True
+        return response
+
+    def _copy_response(self, response, f, desc, digest=None, initial=0):
+        """将响应内容写入已打开的文件对象，并显示进度条；initial 为断点续传时已有的字节数"""
+        total_size = int(response.headers.get('content-length', 0))
+        if total_size:
+            total_size += initial
+        # 多个文件并发下载时各进度条自动分行显示，完成后清除，结果由日志记录
+        with tqdm(total=total_size, initial=initial, unit='iB', unit_scale=True, mininterval=0.5,
+                  miniters=CHUNK_SIZE, desc=desc, leave=False) as pbar:
+            # 以CHUNK_SIZE为单位在C层拷贝，避免逐块的Python循环开销
+            shutil.copyfileobj(response.raw, _ProgressWriter(f, pbar, digest), length=CHUNK_SIZE)
+
+    def _preallocate(self, f, size):
+        """为大文件预先分配磁盘空间，减少流式写入时的碎片和元数据更新（仅Linux）"""
+        fallocate = _native_fallocate()
+        if not PREALLOCATE_THRESHOLD or size < PREALLOCATE_THRESHOLD or fallocate is None:
+            return
+        # 直接调用 fallocate(2)：文件系统不支持时立即失败，而 os.posix_fallocate
+        # 会退化为逐块写入整个文件，反而多出一遍磁盘写入
+        if fallocate(f.fileno(), 0, 0, size) != 0:
+            logger.debug(f"预分配磁盘空间失败 {f.name}: {os.strerror(ctypes.get_errno())}")
+
+    def _download_in_parts(self, url, local_filename, info=None):
+        """将大文件按 SPLIT_PARTS 段并行下载，无法分段时返回 None"""
         try:
-            response = self.session.get(url, headers=headers, stream=True, timeout=TIMEOUT)
+            # 跟随重定向取得最终地址，各段直接请求该地址，不必各自再走一次重定向
+            response = self.session.head(url, headers=_headers_for(url, _DOWNLOAD_HEADERS),
+                                         allow_redirects=True, timeout=TIMEOUT)
             response.raise_for_status()
-            total_size = int(response.headers.get('content-length', 0))
-
-            with open(local_filename, 'wb') as f:
-                with tqdm(total=total_size, unit='iB', unit_scale=True, desc=os.path.basename(local_filename)) as pbar:
-                    for chunk in response.iter_content(chunk_size=8192):
-                        if chunk:
-                            size = f.write(chunk)
-                            pbar.update(size)
+        except requests.exceptions.RequestException as e:
+            logger.debug(f"检查分段下载支持失败 {url}: {str(e)}")
+            return None
+        # 返回 None 时调用方改为单连接下载
+        size = int(response.headers.get('Content-Length', 0))
+        if response.headers.get('Accept-Ranges') != 'bytes' or size < SPLIT_THRESHOLD:
+            return None
+        final_url = response.url
+        etag = response.headers.get('ETag')
+
+        part_filename = local_filename + '.part'
+        part_size = -(-size // SPLIT_PARTS)
+        ranges = [(start, min(start + part_size, size) - 1) for start in range(0, size, part_size)]
+
+        # 各段已写入的字节数，用于判断失败时是否还能改为单连接下载
+        written = [0] * len(ranges)
+
+        def fetch(index, start, end, pbar):
+            # If-Range 保证各段来自同一版本的文件，文件已变化时服务器返回200而不是206
+            range_headers = {'Range': f'bytes={start}-{end}'}
+            if etag:
+                range_headers['If-Range'] = etag
+            with self._open_stream(final_url, _headers_for(final_url, range_headers, origin=url)) as part_response:
+                if part_response.status_code != 206:
+                    raise _RangeNotSatisfied(f"服务器未返回分段内容，状态码: {part_response.status_code}")
+                # 每段使用独立的文件句柄定位到各自的偏移量写入
+                with open(part_filename, 'r+b', buffering=4 * 1024 * 1024) as f:
+                    f.seek(start)
+                    try:
+                        shutil.copyfileobj(part_response.raw, _ProgressWriter(f, pbar), length=CHUNK_SIZE)
+                    finally:
+                        written[index] = f.tell() - start
+                    if f.tell() != end + 1:
+                        raise DownloadError(f"分段内容不完整: bytes={start}-{end}")
+
+        try:
+            with open(part_filename, 'wb') as f:
+                self._preallocate(f, size)
+                f.truncate(size)
+            with tqdm(total=size, unit='iB', unit_scale=True, mininterval=0.5, miniters=CHUNK_SIZE,
+                      desc=os.path.basename(local_filename), leave=False) as pbar, \
+                    ThreadPoolExecutor(max_workers=len(ranges)) as pool:
+                for future in [pool.submit(fetch, i, start, end, pbar) for i, (start, end) in enumerate(ranges)]:
+                    future.result()
+            if info is not None:
+                info['etag'] = etag
+                info['last_modified'] = response.headers.get('Last-Modified')
+                info['sha256'] = self._file_sha256(part_filename)
+            os.replace(part_filename, local_filename)
+            logger.debug(f"分 {len(ranges)} 段下载完成: {local_filename}")
+            return True
+        except Exception as e:
+            # 分段文件中间可能有空洞，不能用于断点续传
+            try:
+                os.unlink(part_filename)
+            except FileNotFoundError:
+                pass
+            # 服务器不按Range返回，或尚未收到任何内容就失败时，改为单连接下载
+            if isinstance(e, _RangeNotSatisfied) or not any(written):
+                logger.warning(f"分段下载不可用，改为单连接下载 {url}: {str(e)}")
+                return None
+            logger.error(f"分段下载文件失败 {url}: {str(e)}")
+            return False
+
+    def download_file_with_progress(self, url, local_filename, headers=None, info=None, size=None):
+        """带进度条的文件下载，返回是否成功，条件请求命中(304)时返回 NOT_MODIFIED"""
+        # 先写入 .part 文件，完整下载后再替换，中断时不会留下看似完整的文件
+        part_filename = local_filename + '.part'
+        request_headers = dict(headers) if headers else {}
+        # info 中有上次中断时记录的ETag时断点续传，If-Range 使远端文件已变化时返回完整内容
+        offset = 0
+        if info and info.get('etag') and os.path.exists(part_filename):
+            offset = os.path.getsize(part_filename)
+            if offset:
+                request_headers['Range'] = f'bytes={offset}-'
+                request_headers['If-Range'] = info['etag']
+        # 条件请求和断点续传仍走单连接
+        if size and size >= SPLIT_THRESHOLD and not request_headers:
+            result = self._download_in_parts(url, local_filename, info)
+            if result is not None:
+                return result
+        written = None
+        try:
+            try:
+                response = self._open_stream(url, request_headers or None)
+            except requests.exceptions.HTTPError as e:
+                # 416 表示 .part 已与远端文件对不上（例如已写满或远端变短），从头下载
+                if not offset or e.response is None or e.response.status_code != 416:
+                    raise
+                logger.warning(f"无法从断点续传，重新下载 {url}")
+                del request_headers['Range'], request_headers['If-Range']
+                offset = 0
+                response = self._open_stream(url, request_headers or None)
+            # 无论成功与否都关闭响应，使连接及时归还连接池
+            with response:
+                if response.status_code == 304:
+                    return NOT_MODIFIED
+                if response.status_code != 206:
+                    offset = 0
+                # 记录ETag、Last-Modified供下次条件请求使用，并边下载边计算sha256
+                digest = None
+                if info is not None:
+                    info['etag'] = response.headers.get('ETag')
+                    info['last_modified'] = response.headers.get('Last-Modified')
+                    digest = hashlib.sha256()
+                    if offset:
+                        with open(part_filename, 'rb') as pf:
+                            for block in iter(lambda: pf.read(CHUNK_SIZE), b''):
+                                digest.update(block)
+                with open(part_filename, 'ab' if offset else 'wb', buffering=4 * 1024 * 1024) as f:
+                    if not offset:
+                        self._preallocate(f, int(response.headers.get('content-length', 0)))
+                    try:
+                        self._copy_response(response, f, os.path.basename(local_filename), digest, offset)
+                    finally:
+                        written = f.tell()
+                    f.truncate(written)
+            os.replace(part_filename, local_filename)
+            if digest is not None:
+                info['sha256'] = digest.hexdigest()
             return True
         except Exception as e:
             logger.error(f"下载文件失败 {url}: {str(e)}")
-            if os.path.exists(local_filename):
-                os.remove(local_filename)
+            # 传输中断且记录了ETag时保留 .part 文件供下次续传，HTTP错误则丢弃
+            if isinstance(e, requests.exceptions.HTTPError) or not (info and info.get('etag')):
+                try:
+                    os.unlink(part_filename)
+                except FileNotFoundError:
+                    pass
+            elif written is not None and os.path.getsize(part_filename) > written:
+                # 去掉预分配但尚未写入的部分，下次从实际写到的位置续传
+                os.truncate(part_filename, written)
             return False
 
+    def download_and_extract_source(self, url, zip_path, headers=None, info=None):
+        """下载源代码ZIP并解压到其所在目录"""
+        # 只有开启 EXTRACT_SOURCE 时才用到，按需导入以加快启动
+        import zipfile
+
+        extract_dir = os.path.dirname(zip_path)
+        try:
+            if KEEP_SOURCE_ZIP:
+                result = self.download_file_with_progress(url, zip_path, headers, info)
+                if result is not True:
+                    return result
+                with zipfile.ZipFile(zip_path) as zf:
+                    zf.extractall(extract_dir)
+            else:
+                # ZIP只写入内存缓冲（超过上限才溢出到临时文件），不在下载目录中落地
+                with tempfile.SpooledTemporaryFile(max_size=64 * 1024 * 1024) as spool:
+                    with self._open_stream(url) as response:
+                        self._copy_response(response, spool, os.path.basename(zip_path))
+                    with zipfile.ZipFile(spool) as zf:
+                        zf.extractall(extract_dir)
+            logger.info(f"成功解压源代码到: {extract_dir}")
+            return True
+        except Exception as e:
+            logger.error(f"下载并解压源代码失败 {url}: {str(e)}")
+            return False
+
+    def _file_sha256(self, path):
+        """计算本地文件的sha256"""
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(CHUNK_SIZE), b''):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def load_manifest(self, version_folder):
+        """读取版本目录下的资源文件清单 {文件名: {'size': 大小, 'sha256': 摘要}}"""
+        return _read_json(os.path.join(version_folder, '.manifest.json'), '资源文件清单')
+
+    def save_manifest(self, version_folder, manifest):
+        """保存版本目录下的资源文件清单"""
+        _write_json_atomic(os.path.join(version_folder, '.manifest.json'), manifest, '资源文件清单')
+
+    def is_local_copy_current(self, url, path, entry):
+        """通过HEAD请求确认本地文件与远端一致（ETag和大小都相同）"""
+        if not entry.get('etag') or not entry.get('sha256') or not os.path.exists(path):
+            return False
+        try:
+            response = self.session.head(url, headers=_DOWNLOAD_HEADERS, allow_redirects=True, timeout=TIMEOUT)
+            response.raise_for_status()
+        except requests.exceptions.RequestException as e:
+            logger.debug(f"检查远端文件失败 {url}: {str(e)}")
+            return False
+        return (response.headers.get('ETag') == entry['etag']
+                and response.headers.get('Content-Length') == str(os.path.getsize(path)))
+
+    def reuse_unchanged_asset(self, asset, prev_folder, prev_manifest, version_folder):
+        """若上一版本中的同名资源文件未变化，将其链接到新版本目录并返回清单条目"""
+        entry = prev_manifest.get(asset['name'])
+        if not entry or entry.get('size') != asset.get('size'):
+            return None
+        # 大小相同但内容不同的文件很常见，只有API提供的sha256摘要一致时才复用
+        if asset.get('digest') != f"sha256:{entry['sha256']}":
+            return None
+        old_path = os.path.join(prev_folder, asset['name'])
+        new_path = os.path.join(version_folder, asset['name'])
+        try:
+            if not os.path.exists(old_path) or self._file_sha256(old_path) != entry['sha256']:
+                return None
+            if os.path.exists(new_path):
+                os.remove(new_path)
+            try:
+                os.link(old_path, new_path)
+            except OSError:
+                shutil.copy2(old_path, new_path)
+        except Exception as e:
+            logger.warning(f"复用资源文件失败，将重新下载 {asset['name']}: {str(e)}")
+            return None
+        return entry
+
     def get_local_version(self, repo):
         """获取本地保存的版本号"""
         repo_name = repo.split('/')[-1]
@@ -217,11 +683,41 @@ class GitHubBackup:
         version_file = os.path.join(DOWNLOAD_DIR, repo_name, 'version.txt')
         try:
             os.makedirs(os.path.dirname(version_file), exist_ok=True)
-            with open(version_file, 'w') as f:
+            # 先写临时文件再替换，避免中断时留下不完整的版本文件导致重复下载
+            tmp_file = version_file + '.tmp'
+            with open(tmp_file, 'w') as f:
                 f.write(version)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_file, version_file)
             logger.info(f"保存版本信息 {repo}: {version}")
         except Exception as e:
             logger.error(f"保存版本信息失败 {repo}: {str(e)}")
+            return
+        # 记录该版本的完成时间，清理旧版本时按此排序，不依赖目录的修改时间
+        index = self.load_version_index(repo)
+        index[version.replace('/', '_')] = time.time_ns()
+        self.save_version_index(repo, index)
+
+    def load_version_index(self, repo):
+        """读取版本目录索引（目录名 -> 下载完成时间，纳秒）"""
+        repo_name = repo.split('/')[-1]
+        return _read_json(os.path.join(DOWNLOAD_DIR, repo_name, 'index.json'), '版本索引')
+
+    def save_version_index(self, repo, index):
+        """保存版本目录索引到本地"""
+        repo_name = repo.split('/')[-1]
+        _write_json_atomic(os.path.join(DOWNLOAD_DIR, repo_name, 'index.json'), index, '版本索引')
+
+    def get_source_meta(self, repo):
+        """获取本地保存的源代码ZIP元数据（版本号、ETag、Last-Modified）"""
+        repo_name = repo.split('/')[-1]
+        return _read_json(os.path.join(DOWNLOAD_DIR, repo_name, 'source.json'), '源代码元数据')
+
+    def save_source_meta(self, repo, meta):
+        """保存源代码ZIP元数据到本地"""
+        repo_name = repo.split('/')[-1]
+        _write_json_atomic(os.path.join(DOWNLOAD_DIR, repo_name, 'source.json'), meta, '源代码元数据')
 
     def clean_old_versions(self, repo):
         """清理旧版本的文件夹"""
@@ -249,71 +745,98 @@ class GitHubBackup:
             logger.info(f"配置保留最近 {KEEP_VERSIONS_COUNT} 个版本")
 
             # 获取所有版本目录
+            # 优先使用索引中记录的下载完成时间（部分文件系统的目录修改时间不可靠），
+            # 索引中没有的目录（如旧版本程序下载的）才回退到目录修改时间
+            index = self.load_version_index(repo)
             version_dirs = []
-            for item in os.listdir(repo_dir):
-                item_path = os.path.join(repo_dir, item)
-                if os.path.isdir(item_path):
-                    # 记录目录创建时间和路径
-                    try:
-                        mtime = os.path.getmtime(item_path)
-                        version_dirs.append((mtime, item, item_path))
-                        logger.debug(f"找到版本目录: {item}, 修改时间: {datetime.fromtimestamp(mtime)}")
-                    except Exception as e:
-                        logger.error(f"获取目录信息失败 {item_path}: {str(e)}")
+            with os.scandir(repo_dir) as it:
+                for entry in it:
+                    if entry.is_dir(follow_symlinks=False):
+                        # 记录目录时间和路径
+                        try:
+                            if entry.name in index:
+                                mtime = index[entry.name] / 1e9
+                            else:
+                                mtime = entry.stat().st_mtime
+                            version_dirs.append((mtime, entry.name, entry.path))
+                            logger.debug("找到版本目录: %s, 修改时间: %s", entry.name, _LazyTime(mtime))
+                        except Exception as e:
+                            logger.error("获取目录信息失败 %s: %s", entry.path, e)
 
             # 如果目录数量小于等于保留数量，不需要删除
             if len(version_dirs) <= KEEP_VERSIONS_COUNT:
                 logger.info(f"当前版本数 ({len(version_dirs)}) 小于等于保留数量 ({KEEP_VERSIONS_COUNT})，无需清理")
                 return
 
-            # 按修改时间排序，最新的在前面
-            version_dirs.sort(reverse=True)
-            logger.info(f"找到 {len(version_dirs)} 个版本目录，将删除最旧的 {len(version_dirs) - KEEP_VERSIONS_COUNT} 个版本")
+            delete_count = len(version_dirs) - KEEP_VERSIONS_COUNT
+            logger.info(f"找到 {len(version_dirs)} 个版本目录，将删除最旧的 {delete_count} 个版本")
 
-            # 保留最新的版本
-            keep_versions = version_dirs[:KEEP_VERSIONS_COUNT]
-            delete_versions = version_dirs[KEEP_VERSIONS_COUNT:]
+            # 只取出最旧的若干个，无需整体排序；当前版本始终保留（较新的目录可能是未完成的下载）
+            current_dir_name = current_version.replace('/', '_')
+            delete_versions = heapq.nsmallest(delete_count, (d for d in version_dirs if d[1] != current_dir_name))
+            keep_versions = [d for d in version_dirs if d not in delete_versions]
 
             # 记录要保留的版本
             for _, name, path in keep_versions:
-                logger.info(f"保留版本目录: {name}")
+                logger.info("保留版本目录: %s", name)
 
             # 删除旧版本
             for _, name, dir_path in delete_versions:
-                logger.info(f"正在删除旧版本目录: {name}")
+                logger.info("正在删除旧版本目录: %s", name)
                 try:
                     self.safe_remove_dir(dir_path)
-                    logger.info(f"成功删除旧版本目录: {name}")
+                    index.pop(name, None)
+                    logger.info("成功删除旧版本目录: %s", name)
                 except Exception as e:
-                    logger.error(f"删除旧版本目录失败 {dir_path}: {str(e)}")
+                    logger.error("删除旧版本目录失败 %s: %s", dir_path, e)
+            self.save_version_index(repo, index)
 
             logger.info(f"完成 {repo} 的旧版本清理")
 
         except Exception as e:
             logger.error(f"清理旧版本时发生错误 {repo}: {str(e)}")
 
-    def download_source_code(self, repo, folder):
+    def download_source_code(self, repo, folder, releases=None):
         """直接下载仓库源代码ZIP文件"""
-        # 获取最新release版本
-        latest_tag = self.get_latest_release(repo)
+        logger.info(f"开始处理仓库: {repo}")
+        # 先读取本地版本，未变化时获取release只需一次条件请求
+        local_version = self.get_local_version(repo)
+        
+        # 获取最新release版本，批量查询(get_latest_releases_bulk)已有结果时不再单独请求
+        if releases is not None and repo in releases:
+            latest_tag = releases[repo]
+        else:
+            latest_tag = self.get_latest_release(repo, local_version)
         if latest_tag:
             tag_name = latest_tag['tag_name']
-            # 将版本号中的斜杠替换为下划线，避免Windows路径问题
-            safe_tag_name = tag_name.replace('/', '_')
-            repo_name = repo.split('/')[-1]
             
             # 检查本地版本
-            local_version = self.get_local_version(repo)
-            if local_version == tag_name:
+            if latest_tag.get('unchanged') or local_version == tag_name:
                 logger.info(f"仓库 {repo} 已是最新版本 {tag_name}，无需下载")
                 # 即使是最新版本，也执行一次清理检查
                 self.clean_old_versions(repo)
                 return True
-                
+            
+            # 将版本号中的斜杠替换为下划线，避免Windows路径问题
+            safe_tag_name = tag_name.replace('/', '_')
+            repo_name = repo.split('/')[-1]
             version_folder = os.path.join(folder, repo_name, safe_tag_name)
+            zip_path = os.path.join(version_folder, f"{repo_name}_{safe_tag_name}_source.zip")
             
-            # 如果版本文件夹已存在，删除它
-            if os.path.exists(version_folder):
+            # 同一tag的源代码ZIP已在本地（例如version.txt丢失），用条件请求确认后可跳过下载
+            source_headers = None
+            source_meta = self.get_source_meta(repo)
+            if source_meta.get('tag') == tag_name and os.path.exists(zip_path):
+                if source_meta.get('etag'):
+                    source_headers = {'If-None-Match': source_meta['etag']}
+                elif source_meta.get('last_modified'):
+                    source_headers = {'If-Modified-Since': source_meta['last_modified']}
+            
+            # 上次未完成的下载会留下清单，已完成的文件和 .part 文件可以继续使用
+            current_manifest = self.load_manifest(version_folder) if os.path.exists(version_folder) else {}
+            
+            # 如果版本文件夹已存在且无法复用，删除它
+            if os.path.exists(version_folder) and not source_headers and not current_manifest:
                 logger.info(f"发现已存在的版本文件夹: {version_folder}")
                 try:
                     self.safe_remove_dir(version_folder)
@@ -326,63 +849,167 @@ class GitHubBackup:
             
             # 下载源代码
             download_url = f"https://codeload.github.com/{repo}/zip/refs/tags/{tag_name}"
-            zip_path = os.path.join(version_folder, f"{repo_name}_{safe_tag_name}_source.zip")
+            source_info = {}
+            manifest, asset_infos = {}, {}
             
             try:
                 logger.info(f"开始下载 {repo} 的release版本 {tag_name}")
-                headers = self._get_headers()
-                if self.download_file_with_progress(download_url, zip_path, headers):
-                    logger.info(f"成功下载源代码: {zip_path}")
-                    
-                    # 下载release资源文件
-                    for asset in latest_tag['assets']:
-                        asset_name = asset['name']
-                        asset_url = asset['browser_download_url']
-                        asset_path = os.path.join(version_folder, asset_name)
-                        
-                        if self.download_file_with_progress(asset_url, asset_path, headers):
-                            logger.info(f"成功下载资源文件: {asset_name}")
-                        else:
-                            logger.error(f"下载资源文件失败: {asset_name}")
-                    
-                    # 保存新版本信息
-                    self.save_local_version(repo, tag_name)
-                    
-                    # 清理旧版本
-                    self.clean_old_versions(repo)
-                    
-                    return True
+                # 源代码和release资源文件交给共享下载线程池并发下载，复用连接池
+                download_source = self.download_and_extract_source if EXTRACT_SOURCE else self.download_file_with_progress
+                jobs = [(functools.partial(download_source, headers=source_headers, info=source_info),
+                         download_url, zip_path)]
+                
+                # 上一版本中未变化的资源文件直接链接过来，其余的下载并记录摘要
+                prev_folder = os.path.join(folder, repo_name, local_version.replace('/', '_')) if local_version else None
+                if prev_folder == version_folder:
+                    prev_folder = None
+                prev_manifest = self.load_manifest(prev_folder) if prev_folder else {}
+                # 批量查询(GraphQL)的结果不含资源文件摘要，无法确认能否复用上一版本的文件；
+                # 上一版本有清单时再请求一次REST版本信息（只有tag变化的仓库会走到这里）
+                if prev_manifest and any('digest' not in asset for asset in latest_tag['assets']):
+                    try:
+                        detailed = self.get_latest_release(repo)
+                    except GitHubBackupError as e:
+                        logger.warning(f"获取资源文件摘要失败 {repo}: {str(e)}，不复用上一版本的文件")
+                        detailed = None
+                    if detailed and detailed['tag_name'] == tag_name:
+                        latest_tag = detailed
+                for asset in latest_tag['assets']:
+                    asset_name = asset['name']
+                    asset_url = asset['browser_download_url']
+                    asset_path = os.path.join(version_folder, asset_name)
+                    entry = self.reuse_unchanged_asset(asset, prev_folder, prev_manifest, version_folder)
+                    if entry:
+                        logger.info("资源文件未变化，复用上一版本的文件: %s", asset_name)
+                        manifest[asset_name] = entry
+                        continue
+                    # 上次运行中已下载完成的文件，确认远端未变化后跳过
+                    entry = current_manifest.get(asset_name, {})
+                    if entry.get('size') == asset.get('size') and self.is_local_copy_current(asset_url, asset_path, entry):
+                        logger.info("资源文件已下载，跳过: %s", asset_name)
+                        manifest[asset_name] = entry
+                        continue
+                    # 只有ETag没有摘要的条目对应中断的下载，带上ETag以便断点续传
+                    asset_infos[asset_name] = {'etag': entry['etag']} if entry.get('etag') and not entry.get('sha256') else {}
+                    jobs.append((functools.partial(self.download_file_with_progress, info=asset_infos[asset_name],
+                                                   size=asset.get('size')),
+                                 asset_url, asset_path))
+                
+                results = list(self._download_executor.map(
+                    lambda job: job[0](job[1], job[2]),
+                    jobs
+                ))
+                
+                for (_, _, path), ok in zip(jobs, results):
+                    if ok is NOT_MODIFIED:
+                        logger.info("文件未变化，沿用本地文件: %s", path)
+                    elif ok:
+                        logger.info("成功下载文件: %s", path)
+                    else:
+                        logger.error("下载文件失败: %s", path)
+                
+                if not all(results):
+                    raise DownloadError(f"{repo} 的release版本 {tag_name} 存在下载失败的文件")
+                
+                for asset in latest_tag['assets']:
+                    info = asset_infos.get(asset['name'])
+                    if info:
+                        manifest[asset['name']] = {'size': asset.get('size'), 'sha256': info['sha256'],
+                                                   'etag': info.get('etag')}
+                self.save_manifest(version_folder, manifest)
+                
+                # 保存新版本信息
+                self.save_local_version(repo, tag_name)
+                if results[0] is not NOT_MODIFIED:
+                    self.save_source_meta(repo, {'tag': tag_name, **source_info})
+                
+                # 清理旧版本
+                self.clean_old_versions(repo)
+                
+                return True
                 
             except Exception as e:
                 logger.error(f"下载源代码失败 {repo}: {str(e)}")
-                # 如果下载失败，清理版本文件夹
-                self.safe_remove_dir(version_folder)
+                # 保留已完成的文件和可续传的 .part 文件，记入清单，下次运行时只下载缺失的部分
+                for asset in latest_tag['assets']:
+                    info = asset_infos.get(asset['name'])
+                    if info and info.get('sha256'):
+                        manifest[asset['name']] = {'size': asset.get('size'), 'sha256': info['sha256'],
+                                                   'etag': info.get('etag')}
+                    elif info and info.get('etag'):
+                        manifest[asset['name']] = {'etag': info['etag']}
+                self.save_manifest(version_folder, manifest)
                 return False
         else:
             logger.warning(f"未找到仓库的release版本: {repo}")
             return False
 
+def _handle_sigterm(signum, frame):
+    """收到 SIGTERM 时与 Ctrl+C 一样中断当前操作：取消尚未开始的任务后退出"""
+    raise SystemExit(128 + signum)
+
+def monitor_once(backup):
+    """执行一轮检查：获取所有仓库的最新release并下载更新"""
+    if not REPOS:
+        logger.warning("REPOS 为空，没有需要检查的仓库")
+        return
+    
+    # 一次请求取回所有仓库的release信息，失败时各仓库再单独查询
+    try:
+        releases = backup.get_latest_releases_bulk(REPOS)
+    except GitHubBackupError as e:
+        logger.warning(f"{str(e)}，改为逐个仓库查询")
+        releases = {}
+    
+    # 各仓库的处理相互独立且以网络I/O为主，使用线程池并发处理
+    with ThreadPoolExecutor(max_workers=min(len(REPOS), MAX_WORKERS)) as executor:
+        futures = {
+            executor.submit(backup.download_source_code, repo, DOWNLOAD_DIR, releases): repo
+            for repo in REPOS
+        }
+        try:
+            for future in as_completed(futures):
+                repo = futures[future]
+                try:
+                    future.result()
+                except GitHubBackupError as e:
+                    logger.error("处理仓库 %s 时发生错误: %s", repo, e)
+                except Exception as e:
+                    logger.error("处理仓库 %s 时发生未知错误: %s", repo, e)
+        except BaseException:
+            # 被中断（Ctrl+C 或 SIGTERM）时取消尚未开始的仓库和下载任务，只等待正在进行的传输结束
+            for future in futures:
+                future.cancel()
+            backup.cancel_pending_downloads()
+            raise
+    
+    backup.prune_etag_cache(REPOS)
+    backup.save_etag_cache()
+
 def monitor_repos():
     """监控仓库更新的主函数"""
     backup = GitHubBackup()
-    
-    for repo in REPOS:
-        try:
-            logger.info(f"开始处理仓库: {repo}")
-            backup.download_source_code(repo, DOWNLOAD_DIR)
-        except GitHubBackupError as e:
-            logger.error(f"处理仓库 {repo} 时发生错误: {str(e)}")
-            continue
-        except Exception as e:
-            logger.error(f"处理仓库 {repo} 时发生未知错误: {str(e)}")
-            continue
-        time.sleep(RETRY_DELAY)  # 避免请求过于频繁
+    try:
+        while True:
+            monitor_once(backup)
+            # POLL_INTERVAL 大于0时常驻运行，复用同一个会话中已建立的连接
+            if POLL_INTERVAL <= 0:
+                break
+            logger.info("%s 秒后进行下一轮检查", POLL_INTERVAL)
+            time.sleep(POLL_INTERVAL)
+    finally:
+        backup.close()
 
 if __name__ == "__main__":
+    setup_logging()
+    signal.signal(signal.SIGTERM, _handle_sigterm)
     try:
         monitor_repos()
     except KeyboardInterrupt:
         logger.info("程序被用户中断")
+    except SystemExit:
+        logger.info("收到 SIGTERM，程序停止")
+        raise
     except Exception as e:
         logger.error(f"程序执行过程中发生未知错误: {str(e)}")
     finally:
@@ -8,6 +8,9 @@ REPOS = [
     "bepass-org/warp-plus"
 ]
 
+# 运行配置
+POLL_INTERVAL = 0  # 轮询间隔（秒）。大于0时程序常驻并按间隔重复检查，0 表示只运行一次
+
 # 版本管理配置
 CLEAN_OLD_VERSIONS = True  # 是否自动清理旧版本
 KEEP_VERSIONS_COUNT = 1    # 保留最近几个版本（当 CLEAN_OLD_VERSIONS 为 True 时生效）
@@ -21,18 +24,25 @@ LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
 DOWNLOAD_DIR = 'downloads'
 MAX_RETRIES = 3
 TIMEOUT = 30
-CHUNK_SIZE = 8192  # 下载时的块大小
+CHUNK_SIZE = 1024 * 1024  # 下载和校验时每次读写的块大小（字节）
+EXTRACT_SOURCE = False  # 是否解压源代码ZIP
+KEEP_SOURCE_ZIP = True  # 解压后是否保留源代码ZIP文件（EXTRACT_SOURCE 为 True 时生效）
+MAX_WORKERS = 4  # 同时处理的仓库数量
+MAX_PARALLEL_DOWNLOADS = 4  # 同时下载的文件总数（所有仓库共用）
+SPLIT_THRESHOLD = 32 * 1024 * 1024  # 超过该大小的文件分段并行下载（字节）
+SPLIT_PARTS = 4  # 分段下载时每个文件的并行连接数
+PREALLOCATE_THRESHOLD = 64 * 1024 * 1024  # 达到该大小的文件下载前预分配磁盘空间（字节），0 表示不预分配
 
 # HTTP配置
 USER_AGENT = 'NAME' #你的github用户名
 GITHUB_API_VERSION = 'application/vnd.github.v3+json'
+POOL_CONNECTIONS = 16  # 连接池缓存的主机数量（每个主机各自一个连接池）
+POOL_MAXSIZE = 64  # 每个主机保持的最大连接数，应不小于并发下载的线程总数
 
 # 代理配置
 HTTP_PROXY = None  # 'http://127.0.0.1:7890'
 HTTPS_PROXY = None  # 'http://127.0.0.1:7890'
 
 # 错误处理配置
-MAX_DOWNLOAD_ATTEMPTS = 3  # 下载失败最大重试次数
-RETRY_DELAY = 5  # 重试延迟（秒）
 BACKOFF_FACTOR = 1  # 重试退避因子
-RETRY_STATUS_CODES = [429, 500, 502, 503, 504]  # 需要重试的HTTP状态码
+RETRY_STATUS_CODES = frozenset({429, 500, 502, 503, 504})  # 需要重试的HTTP状态码